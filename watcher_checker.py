@@ -15,135 +15,385 @@ Použití:
 from __future__ import annotations
 import re
 import json
+import hashlib
+import functools
 import sqlite3
 import argparse
+import concurrent.futures
+import threading
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable, NamedTuple
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import sys
 import logging
 
+try:
+    import orjson  # volitelné: rychlejší (de)serializace snapshotů
+except ImportError:
+    orjson = None
+
 # ---- Konfigurace ----
 DB_PATH = "watcher_state.db"
 USER_AGENT = "watcher-checker/1.0 (https://uncounnt.github.io/Watccher-2.0/)"
 REQUEST_TIMEOUT = 15
+MAX_WORKERS = 16  # paralelní stahování v CLI
 # ----------------------
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 
+# ---- Předkompilované regexy ----
+_PRICE_RE = re.compile(r'([€$]|Kč|CZK)?\s*([+-]?\d{1,3}(?:[ \xa0]\d{3})*(?:[.,]\d+)?)\s*(Kč|CZK|€|\$)?')
+_PRICE_FALLBACK_RE = re.compile(r'([+-]?\d[\d \xa0\.,]*)')
+_PRICE_CZK_RE = re.compile(r'(\d{1,3}(?:[ \xa0]\d{3})*(?:[.,]\d+)?)[ ]*(Kč|CZK)')
+_AVAIL_LABEL_RE = re.compile(r'(Dostupnost\s*[:\-]?\s*([^\n\r]+))', re.IGNORECASE)
+_AVAIL_KEYWORDS = ["Skladem", "Vyprodáno", "Není skladem", "Do týdne", "Na objednávku", "Dostupné", "Available", "Out of stock", "In stock"]
+# jedna alternace = jeden průchod textem místo průchodu pro každé klíčové slovo
+_AVAIL_ANY_RE = re.compile(
+    r'(.{0,40}(?:' + "|".join(re.escape(kw) for kw in _AVAIL_KEYWORDS) + r').{0,40})',
+    re.IGNORECASE,
+)
+_PODROBNOST_RE = re.compile(r'podrobnost', re.IGNORECASE)
+_HEADER_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+_SPEC_RE = re.compile(r'(specifikace|specification|parametr|parameters)', re.IGNORECASE)
+
+# ---- CSS selektory (soupsieve je zkompiluje jen jednou) ----
+_PRICE_ITEMPROP_SELECTOR = '[itemprop="price"]'
+_PRICE_CLASS_SELECTOR = '[class*="price"], [id*="price"]'
+_AVAIL_SELECTOR = '[itemprop="availability"], [class*="availability"], [id*="availability"]'
+
+
 # ---- DB helpers ----
-_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-_cur = _conn.cursor()
-_cur.execute(
-    "CREATE TABLE IF NOT EXISTS page_state ("
+# jedno spojení na vlákno (bez check_same_thread=False a sdíleného kurzoru);
+# s WAL se čtenáři a zapisovatel navzájem neblokují
+_tls = threading.local()
+
+
+def get_conn() -> sqlite3.Connection:
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _tls.conn = conn
+    return conn
+
+
+# KV tabulka s textovým klíčem: WITHOUT ROWID = jeden B-strom místo dvou na dotaz
+_PAGE_STATE_DDL = (
+    "CREATE TABLE IF NOT EXISTS {name} ("
     "url TEXT PRIMARY KEY, "
     "snapshot TEXT, "
-    "checked_at TEXT"
-    ")"
+    "checked_at TEXT, "
+    "hash BLOB, "
+    "etag TEXT, "
+    "last_modified TEXT"
+    ") WITHOUT ROWID"
+)
+# sloupce přidané později, doplňují se do starších DB
+_ADDED_COLUMNS = {"hash": "BLOB", "etag": "TEXT", "last_modified": "TEXT"}
+
+
+def _migrate_page_state() -> None:
+    """Převede starší rowid tabulku page_state na WITHOUT ROWID a doplní chybějící sloupce."""
+    conn = get_conn()
+    existing = {col[1] for col in conn.execute("PRAGMA table_info(page_state)")}
+    with conn:
+        for name, col_type in _ADDED_COLUMNS.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE page_state ADD COLUMN {name} {col_type}")
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='page_state'").fetchone()
+    if "WITHOUT ROWID" in row[0].upper():
+        return
+    with conn:
+        conn.execute(_PAGE_STATE_DDL.format(name="page_state_new"))
+        conn.execute(
+            "INSERT INTO page_state_new(url, snapshot, checked_at, hash, etag, last_modified) "
+            "SELECT url, snapshot, checked_at, hash, etag, last_modified FROM page_state"
+        )
+        conn.execute("DROP TABLE page_state")
+        conn.execute("ALTER TABLE page_state_new RENAME TO page_state")
+
+
+with get_conn() as _init_conn:
+    _init_conn.execute(_PAGE_STATE_DDL.format(name="page_state"))
+_migrate_page_state()
+
+_LOAD_SQL = "SELECT snapshot, hash, checked_at, etag, last_modified FROM page_state WHERE url=?"
+# odpověď 304: obsah beze změny, uloží se jen čas kontroly a případné nové validátory
+_TOUCH_SQL = "UPDATE page_state SET checked_at=?, etag=?, last_modified=? WHERE url=?"
+# checked_at = čas poslední kontroly, aktualizuje se vždy; při shodném hashi je JSON
+# snapshotu stejný, a zapsáním se zároveň opraví nečitelný uložený záznam
+_UPSERT_SQL = (
+    "INSERT INTO page_state(url, snapshot, checked_at, hash, etag, last_modified) VALUES(?,?,?,?,?,?) "
+    "ON CONFLICT(url) DO UPDATE SET snapshot=excluded.snapshot, checked_at=excluded.checked_at, "
+    "hash=excluded.hash, etag=excluded.etag, last_modified=excluded.last_modified"
 )
-_conn.commit()
 
+# (ETag, Last-Modified) z poslední odpovědi serveru pro podmíněný GET
+Validators = Tuple[Optional[str], Optional[str]]
+_NO_VALIDATORS: Validators = (None, None)
 
-def load_state(url: str) -> Optional[Dict[str, Any]]:
-    _cur.execute("SELECT snapshot FROM page_state WHERE url=?", (url,))
-    row = _cur.fetchone()
-    if not row:
-        return None
+
+class StoredState(NamedTuple):
+    """Řádek page_state načtený jedním dotazem."""
+    snapshot: str
+    hash: Optional[bytes]
+    checked_at: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    @property
+    def validators(self) -> Validators:
+        return (self.etag, self.last_modified)
+
+
+def _dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    # orjson vrací rovnou UTF-8 bytes; dekóduje se až pro TEXT sloupec
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys).encode()
+
+
+def _loads(data: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# (JSON pro sloupec snapshot, hash obsahu) z jediné serializace
+EncodedSnapshot = Tuple[str, bytes]
+
+
+def encode_snapshot(snapshot: Dict[str, Any]) -> EncodedSnapshot:
+    """
+    Serializuje obsah snapshotu bez checked_at (ten má vlastní sloupec a jinak by se hash
+    lišil při každé kontrole); uložený JSON i hash vznikají ze stejných bytes.
+    """
+    content = {k: v for k, v in snapshot.items() if k != "checked_at"}
+    body = _dumps_bytes(content, sort_keys=True)
+    return body.decode(), hashlib.blake2b(body, digest_size=16).digest()
+
+
+def snapshot_hash(snapshot: Dict[str, Any]) -> bytes:
+    """Otisk obsahu snapshotu; checked_at se ignoruje."""
+    return encode_snapshot(snapshot)[1]
+
+
+def load_stored(url: str) -> Optional[StoredState]:
+    row = get_conn().execute(_LOAD_SQL, (url,)).fetchone()
+    return StoredState(*row) if row else None
+
+
+def _parse_snapshot(snap_json: str, checked_at: Optional[str]) -> Optional[Dict[str, Any]]:
     try:
-        return json.loads(row[0])
+        snapshot = _loads(snap_json)
     except Exception:
         return None
+    if not isinstance(snapshot, dict):
+        return None
+    # checked_at se ukládá do sloupce (starší záznamy ho mají i v JSONu)
+    if checked_at is not None:
+        snapshot["checked_at"] = checked_at
+    return snapshot
+
+
+def stored_snapshot(stored: Optional[StoredState]) -> Optional[Dict[str, Any]]:
+    if stored is None:
+        return None
+    return _parse_snapshot(stored.snapshot, stored.checked_at)
+
+
+def load_state(url: str) -> Optional[Dict[str, Any]]:
+    return stored_snapshot(load_stored(url))
+
+
+def _state_row(
+    url: str, snapshot: Dict[str, Any], encoded: EncodedSnapshot, validators: Validators
+) -> Tuple[Any, ...]:
+    checked_at = snapshot.get("checked_at") or datetime.utcnow().isoformat() + "Z"
+    snap_json, snap_hash = encoded
+    return (url, snap_json, checked_at, snap_hash, validators[0], validators[1])
+
+
+def save_state(
+    url: str,
+    snapshot: Dict[str, Any],
+    validators: Validators = _NO_VALIDATORS,
+    encoded: Optional[EncodedSnapshot] = None,
+) -> None:
+    # commit řeší volající (`with get_conn():`), aby šlo zapsat víc URL v jedné transakci
+    get_conn().execute(_UPSERT_SQL, _state_row(url, snapshot, encoded or encode_snapshot(snapshot), validators))
+
+
+def save_states(
+    snapshots: Dict[str, Dict[str, Any]],
+    validators: Optional[Dict[str, Validators]] = None,
+    encoded: Optional[Dict[str, EncodedSnapshot]] = None,
+) -> None:
+    """
+    Zapíše více stavů naráz jedním executemany (commit řeší volající).
+    `encoded` může nést už spočtené encode_snapshot(), aby se snapshot neserializoval znovu.
+    """
+    validators = validators or {}
+    encoded = encoded or {}
+    rows = [
+        _state_row(url, snap, encoded.get(url) or encode_snapshot(snap), validators.get(url, _NO_VALIDATORS))
+        for url, snap in snapshots.items()
+    ]
+    get_conn().executemany(_UPSERT_SQL, rows)
 
 
-def save_state(url: str, snapshot: Dict[str, Any]) -> None:
+def touch_states(validators: Dict[str, Validators]) -> None:
+    """Pro odpovědi 304: aktualizuje jen čas kontroly a validátory (commit řeší volající)."""
     now = datetime.utcnow().isoformat() + "Z"
-    snap_json = json.dumps(snapshot, ensure_ascii=False)
-    _cur.execute(
-        "INSERT INTO page_state(url, snapshot, checked_at) VALUES(?,?,?) "
-        "ON CONFLICT(url) DO UPDATE SET snapshot=excluded.snapshot, checked_at=excluded.checked_at",
-        (url, snap_json, now),
-    )
-    _conn.commit()
+    get_conn().executemany(_TOUCH_SQL, [(now, v[0], v[1], url) for url, v in validators.items()])
+
+
+_save_state = save_state  # parametr `save_state` v check_page funkci zastiňuje
 
 
 # ---- Fetch + parse ----
-def fetch_html(url: str) -> str:
-    headers = {"User-Agent": USER_AGENT}
-    r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+# sdílená session: keep-alive + pool spojení, další dotaz na stejný host přeskočí TCP/TLS handshake
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": USER_AGENT})
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+
+class NotModified(Exception):
+    """
+    Server odpověděl 304 — stránka se od poslední kontroly nezměnila.
+    `validators` nese ETag/Last-Modified z odpovědi 304 (nebo odeslané, pokud je server nezopakoval).
+    """
+
+    def __init__(self, url: str, validators: Validators) -> None:
+        super().__init__(url)
+        self.validators = validators
+
+
+def fetch_html(url: str, validators: Validators = _NO_VALIDATORS) -> Tuple[str, Validators]:
+    etag, last_modified = validators
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    r = _SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if r.status_code == 304:
+        raise NotModified(url, (r.headers.get("ETag") or etag, r.headers.get("Last-Modified") or last_modified))
     r.raise_for_status()
-    return r.text
+    return r.text, (r.headers.get("ETag"), r.headers.get("Last-Modified"))
 
 
-def normalize_price(text: Optional[str]) -> Optional[str]:
+# do cache jdou jen krátké řetězce (typicky "199 Kč"); text celého [class*="price"]
+# kontejneru může být libovolně dlouhý a v cache by zbytečně držel paměť
+_PRICE_CACHE_MAX_LEN = 64
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[str], Optional[float]]:
+    """Vrací (normalizovaná cena jako text, číselná hodnota nebo None)."""
+    if text is not None and len(text) <= _PRICE_CACHE_MAX_LEN:
+        return _parse_price_cached(text)
+    return _parse_price(text)
+
+
+def _parse_price(text: Optional[str]) -> Tuple[Optional[str], Optional[float]]:
     if not text:
-        return None
+        return None, None
     t = text.strip()
     # Keep common currency patterns (Kč, CZK, €, $) and extract numeric part
-    m = re.search(
-        r'([€$]|Kč|CZK)?\s*([+-]?\d{1,3}(?:[ \xa0]\d{3})*(?:[.,]\d+)?)\s*(Kč|CZK|€|\$)?',
-        t,
-    )
+    m = _PRICE_RE.search(t)
     if not m:
-        m2 = re.search(r'([+-]?\d[\d \xa0\.,]*)', t)
+        m2 = _PRICE_FALLBACK_RE.search(t)
         if not m2:
-            return t
+            return t, None
         num = m2.group(1)
     else:
         num = m.group(2)
     num_norm = num.replace("\xa0", "").replace(" ", "").replace(",", ".")
     try:
         val = float(num_norm)
-        return f"{val:.2f}"
+        # číselná hodnota odpovídá zobrazené ceně (na haléře), jinak by se lišila procenta i hash
+        return f"{val:.2f}", round(val, 2)
     except Exception:
-        return num_norm
+        return num_norm, None
+
+
+_parse_price_cached = functools.lru_cache(maxsize=4096)(_parse_price)  # stejné ceny se opakují
 
 
-def extract_price(soup: BeautifulSoup) -> Optional[str]:
+def normalize_price(text: Optional[str]) -> Optional[str]:
+    return parse_price(text)[0]
+
+
+def _lazy_page_text(soup: BeautifulSoup) -> Callable[[str], str]:
+    """
+    Vrací page_text(sep) ekvivalentní soup.get_text(sep, strip=True). Strom se projde
+    až při prvním volání a jen jednou, výsledek pro každý oddělovač se pamatuje.
+    """
+    strings: Optional[List[str]] = None
+    joined: Dict[str, str] = {}
+
+    def page_text(sep: str) -> str:
+        nonlocal strings
+        if sep not in joined:
+            if strings is None:
+                strings = list(soup.stripped_strings)
+            joined[sep] = sep.join(strings)
+        return joined[sep]
+
+    return page_text
+
+
+def extract_price(
+    soup: BeautifulSoup, page_text: Optional[Callable[[str], str]] = None
+) -> Tuple[Optional[str], Optional[float]]:
     # 1) hledat elementy s itemprop="price" nebo meta price
-    el = soup.select_one('[itemprop="price"], meta[itemprop="price"]')
+    el = soup.select_one(_PRICE_ITEMPROP_SELECTOR)
     if el:
         if el.name == "meta":
             content = el.get("content")
-            return normalize_price(content)
+            return parse_price(content if isinstance(content, str) else None)
         else:
-            return normalize_price(el.get_text(" ", strip=True))
+            return parse_price(el.get_text(" ", strip=True))
     # 2) hledat text s měnou "Kč" nebo "CZK" nebo simboly
-    text = soup.get_text(" ", strip=True)
-    m = re.search(r'(\d{1,3}(?:[ \xa0]\d{3})*(?:[.,]\d+)?)[ ]*(Kč|CZK)', text)
+    text = page_text(" ") if page_text else soup.get_text(" ", strip=True)
+    m = _PRICE_CZK_RE.search(text)
     if m:
-        return normalize_price(m.group(0))
+        return parse_price(m.group(0))
     # 3) hledat elementy s třídou obsahující "price"
-    price_el = soup.select_one('[class*="price"], [id*="price"]')
+    price_el = soup.select_one(_PRICE_CLASS_SELECTOR)
     if price_el:
-        return normalize_price(price_el.get_text(" ", strip=True))
-    return None
+        return parse_price(price_el.get_text(" ", strip=True))
+    return None, None
 
 
-def extract_availability(soup: BeautifulSoup) -> Optional[str]:
+def extract_availability(soup: BeautifulSoup, page_text: Optional[Callable[[str], str]] = None) -> Optional[str]:
     # 1) podle itemprop availability
-    el = soup.select_one('[itemprop="availability"], [class*="availability"], [id*="availability"]')
+    el = soup.select_one(_AVAIL_SELECTOR)
     if el:
         return el.get_text(" ", strip=True)
     # 2) hledat textové fráze
-    text = soup.get_text("\n", strip=True)
+    text = page_text("\n") if page_text else soup.get_text("\n", strip=True)
     # hledej "Dostupnost:" nebo slova "Skladem", "Vyprodáno", "Na dotaz", "Dostupné"
-    m = re.search(r'(Dostupnost\s*[:\-]?\s*([^\n\r]+))', text, flags=re.IGNORECASE)
+    m = _AVAIL_LABEL_RE.search(text)
     if m:
         return m.group(2).strip()
-    for keyword in ["Skladem", "Vyprodáno", "Není skladem", "Do týdne", "Na objednávku", "Dostupné", "Available", "Out of stock", "In stock"]:
-        if re.search(re.escape(keyword), text, flags=re.IGNORECASE):
-            mm = re.search(r'.{0,40}' + re.escape(keyword) + r'.{0,40}', text, flags=re.IGNORECASE)
-            return mm.group(0).strip() if mm else keyword
-    return None
+    mm = _AVAIL_ANY_RE.search(text)
+    return mm.group(1).strip() if mm else None
 
 
 def extract_details(soup: BeautifulSoup) -> List[str]:
     details: List[str] = []
     # Hledat nadpis "Podrobnosti" a následné <ul>/<ol> nebo odstavce
-    for header_tag in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-        hdrs = soup.find_all(header_tag, string=re.compile(r'podrobnost', re.IGNORECASE))
+    # všechny úrovně nadpisů jedním průchodem stromem, přednost má stále h1 před h2 atd.
+    all_hdrs = soup.find_all(_HEADER_TAGS, string=_PODROBNOST_RE)
+    for header_tag in _HEADER_TAGS:
+        hdrs = [h for h in all_hdrs if h.name == header_tag]
         if hdrs:
             for hdr in hdrs:
                 next_el = hdr.find_next_sibling()
@@ -152,21 +402,15 @@ def extract_details(soup: BeautifulSoup) -> List[str]:
                         details.append(li.get_text(" ", strip=True))
                     if details:
                         return details
-                # fallback: pár následujících siblingů
-                sib = hdr
-                count = 0
-                while count < 8:
-                    sib = sib.find_next_sibling()
-                    if not sib:
-                        break
+                # fallback: pár následujících siblingů (jeden průchod místo 8 volání find_next_sibling)
+                for sib in hdr.find_next_siblings(limit=8):
                     txt = sib.get_text(" ", strip=True)
                     if txt:
                         details.append(txt)
-                    count += 1
                 if details:
                     return details
     # fallback: hledat sekce se slovy "Specifikace" nebo "Specification"
-    spec_headers = soup.find_all(string=re.compile(r'(specifikace|specification|parametr|parameters)', re.IGNORECASE))
+    spec_headers = soup.find_all(string=_SPEC_RE)
     if spec_headers:
         for sh in spec_headers[:3]:
             parent = sh.parent
@@ -177,22 +421,23 @@ def extract_details(soup: BeautifulSoup) -> List[str]:
                 if details:
                     return details
     # poslední fallback: všechny <li> na stránce (omezeně)
-    for li in soup.find_all("li")[:50]:
+    for li in soup.find_all("li", limit=50):
         text = li.get_text(" ", strip=True)
         if text:
             details.append(text)
-    # deduplikace a trim
-    seen = set()
-    out: List[str] = []
-    for d in details:
-        d2 = " ".join(d.split())
-        if d2 and d2 not in seen:
-            seen.add(d2)
-            out.append(d2)
-    return out
+    # deduplikace a trim (dict.fromkeys zachová pořadí)
+    normalized = (" ".join(d.split()) for d in details)
+    return list(dict.fromkeys(d for d in normalized if d))
 
 
 # ---- Compare & summarize ----
+def _legacy_price_val(price: Optional[str]) -> Optional[float]:
+    try:
+        return float(price)
+    except (ValueError, TypeError):
+        return None
+
+
 def summarize_changes(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
     """
     Vrací dict s klíči:
@@ -214,15 +459,14 @@ def summarize_changes(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dic
             changed = True
             changes.append(f"Cena: {old_price} → {new_price}")
 
-            # pokud obě ceny číselné, spočti procenta
-            try:
-                a = float(old_price) if old_price is not None else None
-                b = float(new_price) if new_price is not None else None
-                if a is not None and b is not None and a != 0:
-                    pct = (b - a) / a * 100.0
-                    changes[-1] += f" ({pct:+.2f}%)"
-            except Exception:
-                pass
+            # pokud obě ceny číselné, spočti procenta (price_val už je rozparsovaná při extrakci)
+            # snapshoty uložené před zavedením price_val: cena je už normalizovaná ("%.2f"),
+            # takže stačí float(); parse_price by 4+ místné částky bez oddělovače usekl
+            a = old["price_val"] if "price_val" in old else _legacy_price_val(old_price)
+            b = new.get("price_val")
+            if a is not None and b is not None and a != 0:
+                pct = (b - a) / a * 100.0
+                changes[-1] += f" ({pct:+.2f}%)"
 
         # availability
         if (old.get("availability") or "") != (new.get("availability") or ""):
@@ -232,8 +476,10 @@ def summarize_changes(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dic
         # details: jednoduché diff (added/removed)
         old_det = old.get("details", []) if old else []
         new_det = new.get("details", [])
-        added = [d for d in new_det if d not in old_det]
-        removed = [d for d in old_det if d not in new_det]
+        old_set = set(old_det)
+        new_set = set(new_det)
+        added = [d for d in new_det if d not in old_set]
+        removed = [d for d in old_det if d not in new_set]
         if added:
             changed = True
             changes.append("Přidáno v podrobnostech: " + "; ".join(added[:10]))
@@ -244,22 +490,77 @@ def summarize_changes(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dic
     return {"changed": changed, "changes": changes, "old": old, "new": new}
 
 
+def compare_with_state(
+    stored: Optional[StoredState], new: Dict[str, Any], new_hash: Optional[bytes] = None
+) -> Dict[str, Any]:
+    """
+    Porovná nový snapshot s (předem načteným) uloženým stavem. Při shodném hashi přeskočí
+    parsování JSONu i porovnání po polích: uložený obsah je pak shodný s "new",
+    takže "old" se složí z obsahu "new" a checked_at uloženého záznamu.
+    """
+    if new_hash is None:
+        new_hash = snapshot_hash(new)
+    if stored and stored.hash is not None and stored.hash == new_hash:
+        old = {**new, "checked_at": stored.checked_at}
+        return {"changed": False, "changes": [], "old": old, "new": new}
+    return summarize_changes(stored_snapshot(stored), new)
+
+
+def not_modified_summary(old: Dict[str, Any]) -> Dict[str, Any]:
+    """Shrnutí pro odpověď 304: beze změn, "new" je uložený stav s časem této kontroly."""
+    new = {**old, "checked_at": datetime.utcnow().isoformat() + "Z"}
+    return {"changed": False, "changes": [], "old": old, "new": new}
+
+
 # ---- Main check function ----
-def check_page(url: str, save_state: bool = True) -> Dict[str, Any]:
-    html = fetch_html(url)
+def fetch_snapshot(url: str, validators: Validators = _NO_VALIDATORS) -> Tuple[Dict[str, Any], Validators]:
+    """
+    Stáhne a rozparsuje stránku; nesahá do DB, takže je bezpečná pro vlákna.
+    Vrací snapshot a nové validátory, při 304 vyhodí NotModified (bez parsování).
+    """
+    html, new_validators = fetch_html(url, validators)
     soup = BeautifulSoup(html, "lxml")
+    # text stránky se sestaví nejvýš jednou a jen když CSS cesty v extraktorech nic nenajdou
+    page_text = _lazy_page_text(soup)
 
-    price = extract_price(soup)
-    availability = extract_availability(soup)
+    price, price_val = extract_price(soup, page_text)
+    availability = extract_availability(soup, page_text)
     details = extract_details(soup)
 
-    new_snapshot = {"price": price, "availability": availability, "details": details, "checked_at": datetime.utcnow().isoformat() + "Z"}
-    old_snapshot = load_state(url)
+    snapshot = {"price": price, "price_val": price_val, "availability": availability, "details": details, "checked_at": datetime.utcnow().isoformat() + "Z"}
+    return snapshot, new_validators
+
 
-    summary = summarize_changes(old_snapshot, new_snapshot)
+# (shrnutí, zakódovaný nový snapshot nebo None při 304, validátory k uložení)
+PageResult = Tuple[Dict[str, Any], Optional[EncodedSnapshot], Validators]
+
+
+def evaluate_page(url: str, stored: Optional[StoredState]) -> PageResult:
+    """
+    Stáhne stránku a porovná ji s předem načteným uloženým stavem. Do DB nesahá,
+    takže je bezpečná pro vlákna; zápis výsledku řeší volající.
+    """
+    try:
+        new_snapshot, validators = fetch_snapshot(url, stored.validators if stored else _NO_VALIDATORS)
+    except NotModified as nm:
+        old = stored_snapshot(stored)
+        if old is not None:
+            return not_modified_summary(old), None, nm.validators
+        # 304, ale uložený stav chybí nebo nejde načíst -> stáhnout celou stránku bez podmínky
+        new_snapshot, validators = fetch_snapshot(url)
+    encoded = encode_snapshot(new_snapshot)
+    return compare_with_state(stored, new_snapshot, encoded[1]), encoded, validators
+
+
+def check_page(url: str, save_state: bool = True) -> Dict[str, Any]:
+    summary, encoded, validators = evaluate_page(url, load_stored(url))
 
     if save_state:
-        save_state(url, new_snapshot)
+        with get_conn():
+            if encoded is None:
+                touch_states({url: validators})
+            else:
+                _save_state(url, summary["new"], validators, encoded)
 
     return summary
 
@@ -272,26 +573,55 @@ if __name__ == "__main__":
     p.add_argument("--json", action="store_true", help="vypíše strojově čitelný JSON výstup")
     args = p.parse_args()
 
-    results = {}
-    for url in args.urls:
+    results: Dict[str, Any] = {}
+    to_save: Dict[str, Dict[str, Any]] = {}
+    new_validators: Dict[str, Validators] = {}
+    encoded: Dict[str, EncodedSnapshot] = {}
+    touched: Dict[str, Validators] = {}  # odpovědi 304
+    # stahování, parsování a porovnání paralelně ve vláknech; DB (čtení i zápis) jen
+    # v hlavním vlákně — uložený stav každé URL se načte předem jedním dotazem
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(args.urls))) as ex:
+        futures = {ex.submit(evaluate_page, u, load_stored(u)): u for u in args.urls}
+        for fut in concurrent.futures.as_completed(futures):
+            url = futures[fut]
+            try:
+                res, enc, validators = fut.result()
+                if enc is None:
+                    touched[url] = validators
+                else:
+                    to_save[url] = res["new"]
+                    encoded[url] = enc
+                    new_validators[url] = validators
+                results[url] = res
+                logging.info(f"Zkontrolováno: {url}")
+                if args.json:
+                    # akumulovat, vypsat na konci
+                    continue
+                # lidské shrnutí
+                if res["changed"]:
+                    logging.info("Změny detekovány:")
+                    for c in res["changes"]:
+                        logging.info(" - %s", c)
+                else:
+                    logging.info("Žádné změny detekovány.")
+                logging.info("")  # newline
+            except Exception as e:
+                logging.error("Chyba při zpracování %s: %s", url, e)
+                results[url] = {"error": str(e)}
+
+    # všechny zápisy naráz v jedné transakci -> jeden commit (fsync) na konci běhu
+    if (to_save or touched) and not args.no_save:
         try:
-            logging.info(f"Kontrola: {url}")
-            res = check_page(url, save_state=not args.no_save)
-            results[url] = res
-            if args.json:
-                # akumulovat, vypsat na konci
-                continue
-            # lidské shrnutí
-            if res["changed"]:
-                logging.info("Změny detekovány:")
-                for c in res["changes"]:
-                    logging.info(" - %s", c)
-            else:
-                logging.info("Žádné změny detekovány.")
-            logging.info("")  # newline
+            with get_conn():
+                if to_save:
+                    save_states(to_save, new_validators, encoded)
+                if touched:
+                    touch_states(touched)
         except Exception as e:
-            logging.error("Chyba při zpracování %s: %s", url, e)
-            results[url] = {"error": str(e)}
+            logging.error("Chyba při ukládání stavu: %s", e)
+            for url in [*to_save, *touched]:
+                results[url]["error"] = f"stav se nepodařilo uložit: {e}"
 
     if args.json:
-        print(json.dumps(results, ensure_ascii=False, indent=2))
+        # výstup v pořadí zadaných URL, ne v pořadí dokončení
+        print(json.dumps({u: results[u] for u in args.urls}, ensure_ascii=False, indent=2))